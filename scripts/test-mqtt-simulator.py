@@ -6,226 +6,442 @@ This script publishes realistic test data to MQTT topics to demonstrate
 the automation system's capabilities.
 
 Requirements:
-    pip install paho-mqtt
+    pip install paho-mqtt numpy
+    pip install orjson  # optional, faster JSON encoding
+    pip install numba   # optional, JIT-compiles the numeric kernel
 
 Usage:
     python scripts/test-mqtt-simulator.py
 """
 
+from __future__ import annotations
+
 import json
-import random
+import multiprocessing
+import socket
+import sys
 import time
-import threading
-from datetime import datetime
+import zlib
 import argparse
+import numpy as np
 import paho.mqtt.client as mqtt
 
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+# Hoisted boolean payload constants; paho accepts bytes directly and
+# skips its internal str -> UTF-8 encode
+_TRUE = b"true"
+_FALSE = b"false"
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):  # without numba the kernel is plain NumPy
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True, fastmath=True)
+def _gen_cycle(temp_base, hum_base, loc_scale, loc_bias, draws):
+    """Compute one cycle of raw sensor values from a uniform(-1, 1) draw vector
+
+    Returned layout:
+        [0:4]   temperatures (living-room, kitchen, bedroom, outdoor)
+        [4:7]   humidities (unclamped)
+        [7:10]  test averaging sensor temperatures
+    """
+    out = np.empty(10)
+    out[0:4] = temp_base + draws[0:4] * 2.0 * loc_scale + loc_bias + draws[4:8] * 0.5
+    out[4:7] = hum_base + draws[8:11] * 10.0
+    out[7:10] = temp_base + draws[11:14] * 3.0
+    return out
+
 class MQTTSimulator:
-    def __init__(self, broker_host="localhost", broker_port=1883):
-        self.client = mqtt.Client()
+    def __init__(self, broker_host="localhost", broker_port=1883, quiet=False,
+                 client_id=None, worker_index=0, worker_count=1):
+        self.client = mqtt.Client(client_id)
+        self.client.max_queued_messages_set(0)  # never drop queued publishes
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.running = False
-        
+        self.quiet = quiet
+        # When sharded across workers, each worker owns the topics whose
+        # stable hash lands on its index and skips the rest at flush time
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self._owned = {}
+        # Per-publish log lines are buffered and written to stdout once per
+        # cycle; per-message print() is one syscall each and dominates CPU
+        self._log_buf = []
+
+        # One PCG64 generator shared by all simulators; a single vectorized
+        # draw per function replaces ~20 Python-level random.* calls per cycle
+        self.rng = np.random.default_rng()
+
+        # Per-location adjustments for the temperature vector
+        # (living-room, kitchen, bedroom, outdoor)
+        self._loc_bias = np.array([0.0, 1.0, 0.0, 0.0])   # kitchen runs warmer
+        self._loc_scale = np.array([1.0, 1.0, 1.0, 2.0])  # outdoor varies more
+
+        # Fully-formed topic strings, built once instead of f-string
+        # interpolation on every publish
+        self._temp_topics = (
+            "sensors/temperature/living-room",
+            "sensors/temperature/kitchen",
+            "sensors/temperature/bedroom",
+            "sensors/temperature/outdoor",
+        )
+        self._humidity_topics = (
+            "sensors/humidity/living-room",
+            "sensors/humidity/kitchen",
+            "sensors/humidity/bedroom",
+        )
+        self._test_temp_topics = (
+            "test/temp-sensor-1",
+            "test/temp-sensor-2",
+            "test/temp-sensor-3",
+        )
+
         # Sensor state
         self.temperature_base = 22.0
         self.humidity_base = 45.0
         self.light_level = 50.0
-        self.motion_sensors = {
-            "sensors/motion/living-room": False,
-            "sensors/motion/kitchen": False,
-            "sensors/motion/bedroom": False,
-        }
-        
-    def connect(self):
+        # Motion state as structure-of-arrays: topic strings in a tuple,
+        # on/off state packed into one boolean ndarray
+        self._motion_topics = (
+            "sensors/motion/living-room",
+            "sensors/motion/kitchen",
+            "sensors/motion/bedroom",
+        )
+        self._motion_state = np.zeros(3, dtype=bool)
+        # Fixed (topic, index) pairs for the publish loop: a tuple walk plus
+        # contiguous ndarray indexing, no hash-table traversal
+        self._motion = tuple(zip(self._motion_topics, range(3)))
+
+        # hour -> (base, jitter_low, jitter_high) for the day/night light
+        # cycle; a table lookup replaces re-evaluating the hour-range
+        # branches every cycle
+        self._light_table = [
+            (70, -20, 20) if 6 <= h <= 20 else      # daytime
+            (10, -5, 15) if h >= 21 or h <= 5 else  # night
+            (40, -15, 15)                           # dawn/dusk
+            for h in range(24)
+        ]
+
+        # Pre-encoded payload template for the fixed-schema thermostat status;
+        # only the changing fields get formatted in, no dict or JSON encoder
+        # involved per cycle
+        self._thermo_tmpl = b'{"temperature": %.2f, "target": 21, "mode": "auto", "heating": %s}'
+        self._openclosed = ("open", "closed")
+
+    def connect(self, keepalive=60):
         """Connect to MQTT broker"""
         try:
-            self.client.connect(self.broker_host, self.broker_port, 60)
-            self.client.loop_start()
+            self.client.connect(self.broker_host, self.broker_port, keepalive)
+            # Tune the socket for burst publishing: a large send buffer lets
+            # the kernel coalesce a whole batch, and disabling Nagle avoids
+            # 40ms delays on small trailing segments
+            sock = self.client.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if hasattr(socket, "TCP_QUICKACK"):  # Linux only
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            # Publish-only client: no background reader thread, just process
+            # the CONNACK here and drive the loop ourselves per batch
+            self.client.loop(timeout=1.0)
             print(f"✅ Connected to MQTT broker at {self.broker_host}:{self.broker_port}")
             return True
         except Exception as e:
             print(f"❌ Failed to connect to MQTT broker: {e}")
             return False
-    
+
     def disconnect(self):
         """Disconnect from MQTT broker"""
         self.running = False
-        self.client.loop_stop()
         self.client.disconnect()
+        try:
+            self.client.loop(timeout=1.0)  # flush the DISCONNECT packet
+        except Exception:
+            pass
         print("🔌 Disconnected from MQTT broker")
     
+    def owns_topic(self, topic):
+        """Whether this worker's shard includes the topic (memoized)
+
+        Uses crc32 rather than hash() so the partition is stable across
+        processes regardless of PYTHONHASHSEED.
+        """
+        owned = self._owned.get(topic)
+        if owned is None:
+            owned = zlib.crc32(topic.encode("utf-8")) % self.worker_count == self.worker_index
+            self._owned[topic] = owned
+        return owned
+
     def publish(self, topic, payload):
-        """Publish message to topic"""
-        if isinstance(payload, dict):
-            payload = json.dumps(payload)
-        result = self.client.publish(topic, payload)
-        if result.rc == 0:
-            print(f"📤 {topic}: {payload}")
-        else:
-            print(f"❌ Failed to publish to {topic}")
-    
-    def simulate_temperature_sensors(self):
+        """Queue a single message, returning (topic, payload, result)"""
+        # Pre-encode everything to bytes so paho's packing path never has
+        # to stringify or UTF-8 encode the payload itself
+        if isinstance(payload, bool):
+            payload = _TRUE if payload else _FALSE
+        elif isinstance(payload, float):
+            payload = format(payload, ".1f").encode("ascii")
+        elif isinstance(payload, dict):
+            payload = _dumps(payload)
+        elif isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        # Explicit QoS 0 skips paho's inflight/ack tracking entirely
+        return topic, payload, self.client.publish(topic, payload, qos=0, retain=False)
+
+    def publish_batch(self, batch):
+        """Flush a cycle's worth of queued (topic, payload) messages in one go
+
+        Publishing back-to-back lets paho coalesce the writes instead of
+        paying per-message TCP/syscall overhead ~20 times per cycle. The
+        whole batch is queued and drained before any logging so writes
+        coalesce instead of interleaving with log formatting.
+        """
+        if self.worker_count > 1:
+            owns = self.owns_topic
+            batch = [msg for msg in batch if owns(msg[0])]
+        self.client.max_inflight_messages_set(max(len(batch), 20))
+        pub = self.publish  # hoist the bound-method lookup out of the loop
+        results = [pub(topic, payload) for topic, payload in batch]
+        # Drain the whole batch to the socket, then one read/misc pass for
+        # keepalive (PINGREQ/PINGRESP) handling. On a dropped connection
+        # loop_write errors without consuming the queue, so bail out rather
+        # than spinning on want_write forever
+        while self.client.want_write():
+            if self.client.loop_write() != mqtt.MQTT_ERR_SUCCESS:
+                break
+        self.client.loop(timeout=0.01)
+        for topic, payload, result in results:
+            if result.rc != 0:
+                self._log_buf.append(f"❌ Failed to publish to {topic}")
+            elif not self.quiet:
+                self._log_buf.append(f"📤 {topic}: {payload.decode('utf-8')}")
+
+    def flush_log(self):
+        """Write all buffered log lines to stdout in a single call"""
+        if self._log_buf:
+            sys.stdout.write("\n".join(self._log_buf) + "\n")
+            self._log_buf.clear()
+
+    def simulate_temperature_sensors(self, batch, values):
         """Simulate temperature readings with gradual changes"""
-        locations = ["living-room", "kitchen", "bedroom", "outdoor"]
-        
-        for location in locations:
-            # Add some variation based on location
-            variation = random.uniform(-2.0, 2.0)
-            if location == "outdoor":
-                variation *= 2  # Outdoor varies more
-            elif location == "kitchen":
-                variation += 1.0  # Kitchen tends to be warmer
-            
-            temp = self.temperature_base + variation
-            # Add small random fluctuation
-            temp += random.uniform(-0.5, 0.5)
-            
-            # Celsius
-            self.publish(f"sensors/temperature/{location}", round(temp, 1))
-            
-            # Also publish Celsius for the converter test
-            if location == "living-room":
-                self.publish("sensors/temperature/celsius", round(temp, 1))
-    
-    def simulate_humidity_sensors(self):
+        temps = values[0:4].tolist()
+
+        # Celsius
+        append = batch.append
+        for topic, temp in zip(self._temp_topics, temps):
+            append((topic, temp))
+
+        # Also publish living-room Celsius for the converter test
+        append(("sensors/temperature/celsius", temps[0]))
+
+    def simulate_humidity_sensors(self, batch, values):
         """Simulate humidity readings"""
-        locations = ["living-room", "kitchen", "bedroom"]
-        
-        for location in locations:
-            humidity = self.humidity_base + random.uniform(-10, 10)
-            humidity = max(20, min(80, humidity))  # Keep in realistic range
-            self.publish(f"sensors/humidity/{location}", round(humidity, 1))
-    
-    def simulate_light_sensors(self):
+        # Clamp the whole vector to a realistic range in one call
+        humidities = np.clip(values[4:7], 20, 80).tolist()
+        append = batch.append
+        for topic, humidity in zip(self._humidity_topics, humidities):
+            append((topic, humidity))
+
+    def simulate_light_sensors(self, batch, current_hour):
         """Simulate light level changes throughout the day"""
-        current_hour = datetime.now().hour
-        
-        # Simulate day/night cycle
-        if 6 <= current_hour <= 20:  # Daytime
-            base_light = 70 + random.uniform(-20, 20)
-        elif 21 <= current_hour <= 23 or 0 <= current_hour <= 5:  # Night
-            base_light = 10 + random.uniform(-5, 15)
-        else:  # Dawn/dusk
-            base_light = 40 + random.uniform(-15, 15)
-        
-        self.light_level = max(0, min(100, base_light))
-        self.publish("sensors/light", round(self.light_level, 1))
-    
-    def simulate_motion_sensors(self):
+        # Simulate day/night cycle via the precomputed hour table
+        base, lo, hi = self._light_table[current_hour]
+        base_light = base + self.rng.uniform(lo, hi)
+
+
+        self.light_level = float(np.clip(base_light, 0, 100))
+        batch.append(("sensors/light", round(self.light_level, 1)))
+
+    def simulate_motion_sensors(self, batch, current_hour):
         """Simulate motion detection with realistic patterns"""
-        current_hour = datetime.now().hour
-        
         # Higher motion probability during day
         motion_probability = 0.3 if 6 <= current_hour <= 22 else 0.1
-        
-        for sensor_topic in self.motion_sensors:
-            current_state = self.motion_sensors[sensor_topic]
-            
-            if current_state:
-                # If motion is active, 70% chance to turn off
-                if random.random() < 0.7:
-                    self.motion_sensors[sensor_topic] = False
-                    self.publish(sensor_topic, False)
-            else:
-                # If no motion, check probability to activate
-                if random.random() < motion_probability:
-                    self.motion_sensors[sensor_topic] = True
-                    self.publish(sensor_topic, True)
-    
-    def simulate_device_status(self):
+
+        # Branchless state transition on the whole array: active sensors have
+        # a 70% chance to turn off, idle ones activate with motion_probability
+        r = self.rng.random(3)
+        active = self._motion_state
+        turn_off = active & (r < 0.7)
+        turn_on = ~active & (r < motion_probability)
+        new_state = (active ^ turn_off) | turn_on
+        self._motion_state = new_state
+
+        changed = new_state ^ active
+        append = batch.append
+        for topic, idx in self._motion:
+            if changed[idx]:
+                append((topic, bool(new_state[idx])))
+
+    def simulate_device_status(self, batch):
         """Simulate various device status messages"""
+        # One integer draw covers all three coin flips
+        flips = self.rng.integers(0, 2, 3)
         devices = {
-            "devices/thermostat/status": {
-                "temperature": self.temperature_base,
-                "target": 21,
-                "mode": "auto",
-                "heating": random.choice([True, False])
-            },
-            "devices/smart-plug/power": random.uniform(10, 150),
-            "devices/door-sensor": random.choice(["open", "closed"]),
-            "devices/window-sensor": random.choice(["open", "closed"]),
+            "devices/thermostat/status": self._thermo_tmpl % (
+                self.temperature_base, b"true" if flips[0] else b"false"),
+            "devices/smart-plug/power": self.rng.uniform(10, 150),
+            "devices/door-sensor": self._openclosed[flips[1]],
+            "devices/window-sensor": self._openclosed[flips[2]],
         }
         
+        append = batch.append
         for topic, value in devices.items():
-            self.publish(topic, value)
-    
-    def simulate_test_scenarios(self):
+            append((topic, value))
+
+    def simulate_test_scenarios(self, batch, values):
         """Publish specific test data for strategy testing"""
         # Test threshold detector with varying values
         test_value = 20 + (time.time() % 20)  # Oscillates between 20-40
-        self.publish("test/threshold-sensor", round(test_value, 1))
-        
+        batch.append(("test/threshold-sensor", round(test_value, 1)))
+
         # Test toggle trigger
-        if random.random() < 0.2:  # 20% chance to trigger toggle
-            self.publish("test/toggle-button", True)
-        
+        if self.rng.random() < 0.2:  # 20% chance to trigger toggle
+            batch.append(("test/toggle-button", True))
+
         # Test multiple sensors for averaging
-        for i in range(3):
-            temp = self.temperature_base + random.uniform(-3, 3)
-            self.publish(f"test/temp-sensor-{i+1}", round(temp, 1))
+        append = batch.append
+        for topic, temp in zip(self._test_temp_topics, values[7:10].tolist()):
+            append((topic, temp))
     
-    def run_simulation(self, duration=None):
-        """Run the simulation"""
-        if not self.connect():
+    def run_simulation(self, duration=None, interval=5.0, rate=None):
+        """Run the simulation
+
+        With a rate (messages/sec) the loop acts as a token-bucket load
+        generator: each cycle earns len(batch)/rate seconds of budget, so
+        the broker sees a steady message rate rather than a fixed cadence.
+        """
+        # The network loop only runs once per cycle, so the keepalive must
+        # comfortably exceed the cycle interval or the broker drops us
+        # before the next PINGREQ goes out
+        if not self.connect(keepalive=max(60, int(interval * 2))):
             return
-        
+
         self.running = True
         start_time = time.time()
         cycle_count = 0
-        
+
         print("🚀 Starting MQTT simulation...")
-        print("📊 Publishing test data every 5 seconds")
+        if rate:
+            print(f"📊 Publishing test data at ~{rate:g} messages/second")
+        else:
+            print(f"📊 Publishing test data every {interval} seconds")
         print("Press Ctrl+C to stop\n")
-        
+
+        # Pace against a monotonic deadline so cycle time spent simulating
+        # and publishing doesn't accumulate as wall-clock drift
+        next_tick = time.monotonic()
+
         try:
             while self.running:
                 if duration and (time.time() - start_time) > duration:
                     break
                 
                 cycle_count += 1
-                print(f"\n--- Simulation Cycle {cycle_count} ---")
-                
-                # Simulate all sensor types
-                self.simulate_temperature_sensors()
-                self.simulate_humidity_sensors()
-                self.simulate_light_sensors()
-                self.simulate_motion_sensors()
-                self.simulate_device_status()
-                self.simulate_test_scenarios()
+                if not self.quiet:
+                    self._log_buf.append(f"\n--- Simulation Cycle {cycle_count} ---")
+
+
+                # Collect a full cycle of messages, then flush them in one batch
+                # (hour computed once; localtime skips the datetime allocation)
+                current_hour = time.localtime().tm_hour
+                # One draw vector feeds the numeric kernel for the whole cycle
+                draws = self.rng.uniform(-1.0, 1.0, 16)
+                values = _gen_cycle(self.temperature_base, self.humidity_base,
+                                    self._loc_scale, self._loc_bias, draws)
+                np.round(values, 1, out=values)  # round the whole cycle at once
+                batch = []
+                self.simulate_temperature_sensors(batch, values)
+                self.simulate_humidity_sensors(batch, values)
+                self.simulate_light_sensors(batch, current_hour)
+                self.simulate_motion_sensors(batch, current_hour)
+                self.simulate_device_status(batch)
+                self.simulate_test_scenarios(batch, values)
+                self.publish_batch(batch)
                 
                 # Gradually change base values for more realistic simulation
-                self.temperature_base += random.uniform(-0.1, 0.1)
+                self.temperature_base += self.rng.uniform(-0.1, 0.1)
                 self.temperature_base = max(18, min(30, self.temperature_base))
-                
-                self.humidity_base += random.uniform(-0.5, 0.5)
+
+                self.humidity_base += self.rng.uniform(-0.5, 0.5)
                 self.humidity_base = max(30, min(70, self.humidity_base))
-                
-                time.sleep(5)
+
+                self.flush_log()
+                next_tick += (len(batch) / rate) if rate else interval
+                now = time.monotonic()
+                if next_tick < now - 1.0:
+                    # Fell too far behind (rate above what one client can
+                    # sustain); resync instead of bursting to catch up
+                    next_tick = now
+                time.sleep(max(0.0, next_tick - now))
                 
         except KeyboardInterrupt:
             print("\n⏹️ Simulation stopped by user")
         finally:
             self.disconnect()
 
+def _run_worker(args, index):
+    """Entry point for one sharded simulator process"""
+    simulator = MQTTSimulator(args.host, args.port, quiet=args.quiet,
+                              client_id=f"mqtt-simulator-{index}",
+                              worker_index=index, worker_count=args.workers)
+    simulator.run_simulation(args.duration, args.interval, args.rate)
+
 def main():
     parser = argparse.ArgumentParser(description="MQTT Test Data Simulator")
     parser.add_argument("--host", default="localhost", help="MQTT broker host")
     parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
     parser.add_argument("--duration", type=int, help="Simulation duration in seconds")
-    parser.add_argument("--scenario", choices=["basic", "motion", "temperature", "all"], 
+    parser.add_argument("--interval", type=float, default=5.0,
+                       help="Seconds between simulation cycles")
+    parser.add_argument("--rate", type=float,
+                       help="Target publish rate in messages/second "
+                            "(overrides --interval)")
+    parser.add_argument("--scenario", choices=["basic", "motion", "temperature", "all"],
                        default="all", help="Test scenario to run")
-    
+    parser.add_argument("--quiet", action="store_true",
+                       help="Suppress per-message publish logging")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Number of simulator processes, each with its own "
+                            "broker connection and disjoint topic shard")
+
     args = parser.parse_args()
-    
-    simulator = MQTTSimulator(args.host, args.port)
+
+    if args.workers > 1:
+        # N processes, N connections: sidesteps both the GIL and the
+        # single-TCP-connection serialization on the broker side
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_run_worker, args=(args, i))
+                   for i in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        return
+
+    simulator = MQTTSimulator(args.host, args.port, quiet=args.quiet)
     
     if args.scenario == "all":
-        simulator.run_simulation(args.duration)
+        simulator.run_simulation(args.duration, args.interval, args.rate)
     else:
         # Could implement specific scenarios here
         print(f"Running {args.scenario} scenario...")
-        simulator.run_simulation(args.duration)
+        simulator.run_simulation(args.duration, args.interval, args.rate)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file